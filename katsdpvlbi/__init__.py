@@ -0,0 +1 @@
+"""MeerKAT VLBI data capture utilities."""
@@ -0,0 +1,125 @@
+"""jive5ab control protocol helpers for the KATCP proxy."""
+
+import asyncio
+import re
+
+from aiokatcp import DeviceServer, Sensor
+
+RE_STATUS = re.compile(r"!status\?\s+\d+\s:\s(\w+)\s:\s(\d+)")
+RE_PROTO = re.compile(r"!net_protocol\?\s+\d+\s:\s([A-Za-z0-9_]+)")
+RE_PORT = re.compile(r"!net_port\?\s+\d+\s:\s(.+?)\s;")
+RE_RECORD = re.compile(r"!record\?\s+\d+\s:\s(\w+)\s:\s(\d+)")
+
+
+def parse_status(reply: str) -> str:
+    """Extract the state from a ``status?`` reply."""
+
+    m = RE_STATUS.search(reply)
+    return m.group(1) if m else "unknown"
+
+
+def parse_protocol(reply: str) -> str:
+    """Extract the network protocol from a ``net_protocol?`` reply."""
+
+    m = RE_PROTO.search(reply)
+    return m.group(1) if m else "unknown"
+
+
+def parse_port(reply: str) -> str:
+    """Extract the configured port from a ``net_port?`` reply."""
+
+    m = RE_PORT.search(reply)
+    return m.group(1).strip() if m else "unknown"
+
+
+class Jive5abServerBase(DeviceServer):
+    """KATCP device server holding a persistent jive5ab control connection.
+
+    Subclasses add the sensors, polling and requests they need.
+    """
+
+    def __init__(self, host: str, port: int, jive_port: int):
+        super().__init__(host, port)
+        self.jive_port = jive_port
+        self._jive_r, self._jive_w, self._jive_lock = None, None, asyncio.Lock()
+
+    def _make_sensor(self, sensor_type, name, description, initial):
+        """Create a sensor, initialise it and add it to the server."""
+
+        sensor = Sensor(sensor_type, name, description)
+        sensor.set_value(initial)
+        # Older aiokatcp only accepts one sensor per add()
+        self.sensors.add(sensor)
+        return sensor
+
+    async def on_stop(self):
+        # Runs after in-flight requests finish or are cancelled, on ?halt as well
+        async with self._jive_lock:
+            await self._jive_close()
+        await super().on_stop()
+
+    async def _jive_cmd(self, cmd: str, timeout: float = 1.0) -> str:
+        """Send *cmd* to the jive5ab control port and return the raw reply."""
+
+        return (await self._jive_cmds([cmd], timeout))[0]
+
+    async def _jive_cmds(self, cmds, timeout: float = 1.0) -> list:
+        """Send *cmds* to the jive5ab control port and return their raw replies.
+
+        The commands are pipelined: all are written before the first reply
+        is read, so a batch costs about one round trip. All commands share
+        one control connection, which is opened on first use and dropped on
+        any error so that the next command reconnects. If a reused
+        connection turns out to be dead (jive5ab restarted or closed it while
+        idle) before any reply arrives, the batch is resent once on a new one.
+        *timeout* bounds the whole exchange, including any reconnect.
+        """
+
+        request = b"".join((cmd.strip() + ";\n").encode("ascii") for cmd in cmds)
+        async with self._jive_lock:
+            try:
+                async with asyncio.timeout(timeout):
+                    reused = self._jive_w is not None
+                    while True:
+                        if self._jive_w is None:
+                            self._jive_r, self._jive_w = await asyncio.open_connection(
+                                "127.0.0.1", self.jive_port
+                            )
+                        replies = []
+                        try:
+                            self._jive_w.write(request)
+                            await self._jive_w.drain()
+                            while len(replies) < len(cmds):
+                                replies.append(await self._jive_r.readuntil(b"\n"))
+                            break
+                        except asyncio.IncompleteReadError as err:
+                            await self._jive_close()
+                            if err.partial and len(replies) == len(cmds) - 1:
+                                # jive5ab hung up mid-reply; return what arrived, as read() used to
+                                replies.append(err.partial)
+                                break
+                            if replies or err.partial or not reused:
+                                raise ConnectionResetError(
+                                    "jive5ab closed the control connection") from err
+                        except (ConnectionResetError, BrokenPipeError):
+                            await self._jive_close()
+                            if replies or not reused:
+                                raise
+                        reused = False
+            except BaseException:
+                # A late or partial reply would be read by the next command
+                await self._jive_close()
+                raise
+        return [data.decode("ascii", errors="ignore") for data in replies]
+
+    async def _jive_close(self) -> None:
+        """Close the jive5ab control connection, if open."""
+
+        writer = self._jive_w
+        self._jive_r = self._jive_w = None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
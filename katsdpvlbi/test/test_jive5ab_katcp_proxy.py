@@ -0,0 +1,84 @@
+"""Tests for the poll back-off in ``scripts/jive5ab_katcp_proxy.py``."""
+
+import asyncio
+import importlib.util
+import pathlib
+import sys
+
+from .test_jive_proto import FakeJive5ab
+
+SCRIPT = pathlib.Path(__file__).parents[2] / "scripts" / "jive5ab_katcp_proxy.py"
+
+
+def _load_proxy():
+    spec = importlib.util.spec_from_file_location("jive5ab_katcp_proxy", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+proxy = _load_proxy()
+
+
+async def _wait_for_commands(jive, cmd, n):
+    async with asyncio.timeout(5):
+        while jive.commands.count(cmd) < n:
+            await asyncio.sleep(0.01)
+
+
+def test_poll_interval_backs_off_and_resets():
+    async def run():
+        jive = FakeJive5ab()
+        port = await jive.start()
+        server = proxy.Jive5abServer("127.0.0.1", 0, port)
+        intervals = []
+        try:
+            # Nothing changes: 120 s doubles up to the 600 s cap
+            for _ in range(4):
+                await server._poll_once()
+                intervals.append(server._poll_interval)
+            assert intervals == [240.0, 480.0, 600.0, 600.0]
+
+            jive.replies["status?"] = "!status? 0 : record : 0 ;"
+            await server._poll_once()
+            assert server.s_state.value == "record"
+            assert server._poll_interval == 120.0
+
+            await server._poll_once()
+            assert server._poll_interval == 240.0
+            await server._poll_once(reset=True)
+            assert server._poll_interval == 120.0
+
+            await server._poll_once()
+            assert server._poll_interval == 240.0
+            await jive.stop()
+            await server._poll_once()
+            assert server.s_error.value.startswith("poll:")
+            assert server._poll_interval == 120.0
+        finally:
+            await server._jive_close()
+            await jive.stop()
+
+    asyncio.run(run())
+
+
+def test_reset_restarts_poll_wait():
+    async def run():
+        jive = FakeJive5ab()
+        port = await jive.start()
+        server = proxy.Jive5abServer("127.0.0.1", 0, port)
+        server.POLL_INTERVAL = server.POLL_INTERVAL_MAX = 1000.0
+        await server.start()
+        try:
+            await _wait_for_commands(jive, "status?", 1)
+            # A request-driven poll drops the interval; the loop must not sit
+            # out the 1000 s wait it had already started
+            server.POLL_INTERVAL = 0.05
+            await server._poll_once(reset=True)
+            await _wait_for_commands(jive, "status?", 3)
+        finally:
+            await server.stop()
+            await jive.stop()
+
+    asyncio.run(run())
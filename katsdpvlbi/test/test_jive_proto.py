@@ -0,0 +1,164 @@
+"""Tests for :mod:`katsdpvlbi.jive_proto`."""
+
+import asyncio
+
+import aiokatcp
+import pytest
+
+from katsdpvlbi.jive_proto import Jive5abServerBase
+
+
+class FakeJive5ab:
+    """Minimal jive5ab control port: answers ``!<cmd> 0 ;`` to every command,
+    or the reply set for it in :attr:`replies`.
+
+    With *reply* False it reads one command and hangs up without answering.
+    Replies are held back until *answer_after* commands have arrived, which
+    only a pipelining client survives. Clearing :attr:`answer` makes it
+    swallow further commands without replying.
+    """
+
+    def __init__(self, reply=True, answer_after=1):
+        self.reply = reply
+        self.answer_after = answer_after
+        self.answer = True
+        self.replies = {}
+        self.commands = []
+        self._writers = []
+        self._server = None
+
+    async def start(self, port=0):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        for writer in self._writers:
+            writer.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self._writers.append(writer)
+        pending = []
+        try:
+            while line := await reader.readuntil(b"\n"):
+                cmd = line.decode("ascii").rstrip(";\n")
+                self.commands.append(cmd)
+                if not self.reply:
+                    break
+                if not self.answer:
+                    continue
+                pending.append((self.replies.get(cmd, f"!{cmd} 0 ;") + "\n").encode("ascii"))
+                if len(pending) >= self.answer_after:
+                    writer.write(b"".join(pending))
+                    pending.clear()
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        writer.close()
+
+
+class DummyServer(Jive5abServerBase):
+    VERSION = "dummy-1.0"
+    BUILD_STATE = "dummy-1.0"
+
+    async def request_jive(self, ctx, cmd: str) -> str:
+        """Forward a raw command to jive5ab."""
+        return await self._jive_cmd(cmd, timeout=10.0)
+
+
+async def _wait_for_commands(jive, n):
+    while len(jive.commands) < n:
+        await asyncio.sleep(0.01)
+
+
+def test_reconnect_after_jive5ab_restart():
+    async def run():
+        jive = FakeJive5ab()
+        port = await jive.start()
+        server = DummyServer("127.0.0.1", 0, port)
+        assert await server._jive_cmd("status?") == "!status? 0 ;\n"
+        # Restart jive5ab on the same port behind the proxy's idle connection
+        await jive.stop()
+        restarted = FakeJive5ab()
+        await restarted.start(port)
+        try:
+            assert await server._jive_cmd("record = on:scan1") == "!record = on:scan1 0 ;\n"
+            assert restarted.commands == ["record = on:scan1"]
+        finally:
+            await server._jive_close()
+            await restarted.stop()
+
+    asyncio.run(run())
+
+
+def test_lost_command_raises():
+    async def run():
+        jive = FakeJive5ab(reply=False)
+        port = await jive.start()
+        server = DummyServer("127.0.0.1", 0, port)
+        try:
+            with pytest.raises(ConnectionResetError):
+                await server._jive_cmd("record = on:scan1")
+        finally:
+            await server._jive_close()
+            await jive.stop()
+
+    asyncio.run(run())
+
+
+def test_commands_are_pipelined():
+    async def run():
+        jive = FakeJive5ab(answer_after=3)
+        port = await jive.start()
+        server = DummyServer("127.0.0.1", 0, port)
+        try:
+            replies = await server._jive_cmds(["status?", "net_protocol?", "net_port?"])
+            assert replies == ["!status? 0 ;\n", "!net_protocol? 0 ;\n", "!net_port? 0 ;\n"]
+        finally:
+            await server._jive_close()
+            await jive.stop()
+
+    asyncio.run(run())
+
+
+def test_halt_closes_connection():
+    async def run():
+        jive = FakeJive5ab()
+        port = await jive.start()
+        server = DummyServer("127.0.0.1", 0, port)
+        await server.start()
+        try:
+            await server._jive_cmd("status?")
+            server.halt()
+            await server.join()
+            assert server._jive_w is None
+        finally:
+            await jive.stop()
+
+    asyncio.run(run())
+
+
+def test_stop_does_not_resend_in_flight_command():
+    async def run():
+        jive = FakeJive5ab()
+        port = await jive.start()
+        server = DummyServer("127.0.0.1", 0, port)
+        await server.start()
+        host, katcp_port = server.sockets[0].getsockname()[:2]
+        client = await aiokatcp.Client.connect(host, katcp_port)
+        try:
+            await server._jive_cmd("status?")
+            jive.answer = False
+            request = asyncio.create_task(client.request("jive", "record = on:scan1"))
+            await _wait_for_commands(jive, 2)
+            await server.stop()
+            assert jive.commands == ["status?", "record = on:scan1"]
+            assert server._jive_w is None
+            request.cancel()
+        finally:
+            client.close()
+            await client.wait_closed()
+            await jive.stop()
+
+    asyncio.run(run())
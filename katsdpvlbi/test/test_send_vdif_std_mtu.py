@@ -0,0 +1,146 @@
+"""Tests for the frame encoding in ``scripts/send_vdif_std_mtu_sync_seq.py``."""
+
+import importlib.util
+import math
+import pathlib
+import socket
+import struct
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+SCRIPT = pathlib.Path(__file__).parents[2] / "scripts" / "send_vdif_std_mtu_sync_seq.py"
+SAMPLES_PER_FRAME = 1432 * 4
+
+
+def _load_sender():
+    spec = importlib.util.spec_from_file_location("send_vdif_std_mtu_sync_seq", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    # numba's kernel cache records the module name, so keep the one compiled
+    # here away from the script's own cache next to it
+    sys.modules[spec.name] = module
+    if numba is None:
+        spec.loader.exec_module(module)
+        return module
+    cache_dir, numba.config.CACHE_DIR = numba.config.CACHE_DIR, _CACHE_DIR.name
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        numba.config.CACHE_DIR = cache_dir
+    return module
+
+
+_CACHE_DIR = tempfile.TemporaryDirectory()
+sender = _load_sender()
+
+
+def _reference_quantize(x, thr):
+    """The original quantiser: bin index of each sample."""
+    return np.digitize(x, thr, right=True).astype(np.uint8)
+
+
+def _reference_pack(q):
+    """The original packer: four samples per byte, first in the top bits."""
+    q4 = q.reshape(-1, 4)
+    return ((q4[:, 0] << 6) | (q4[:, 1] << 4) | (q4[:, 2] << 2) | q4[:, 3]).astype(np.uint8)
+
+
+def _quantize(x, thr):
+    out = np.empty(len(x), dtype=np.uint8)
+    return sender.quantize_2bit_unsigned(x, thr, out, np.empty(len(x), dtype=bool))
+
+
+def _pack(q):
+    out = np.empty(len(q) // 4, dtype=np.uint8)
+    return sender.pack_2bit(q, out, np.empty((2, len(out)), dtype=np.uint32))
+
+
+def test_quantize_2bit_matches_digitize():
+    rng = np.random.default_rng(1)
+    thr = sender.quantize_thresholds(math.sqrt(0.5 + 0.2**2))
+    x = rng.standard_normal(SAMPLES_PER_FRAME, dtype=np.float32)
+    # Samples on and either side of each threshold
+    edges = np.array(thr, dtype=np.float32)
+    x[:9] = np.concatenate([np.nextafter(edges, -np.inf), edges, np.nextafter(edges, np.inf)])
+    np.testing.assert_array_equal(_quantize(x, thr), _reference_quantize(x, thr))
+
+
+def test_pack_2bit_matches_shifts():
+    rng = np.random.default_rng(2)
+    q = rng.integers(0, 4, SAMPLES_PER_FRAME, dtype=np.uint8)
+    q_before = q.copy()
+    np.testing.assert_array_equal(_pack(q), _reference_pack(q))
+    np.testing.assert_array_equal(q, q_before)
+
+
+@pytest.mark.skipif(sender.quantize_pack is None, reason="numba is not installed")
+def test_quantize_pack_matches_numpy():
+    rng = np.random.default_rng(3)
+    noise_std = np.float32(0.2)
+    thr = sender.quantize_thresholds(math.sqrt(0.5 + noise_std**2))
+    x = rng.standard_normal(SAMPLES_PER_FRAME, dtype=np.float32)
+    noise = rng.standard_normal(SAMPLES_PER_FRAME, dtype=np.float32)
+    # Half the samples sum to within an ulp of a threshold, where any change
+    # in rounding (e.g. a fused multiply-add) flips the output
+    near = slice(0, SAMPLES_PER_FRAME // 2)
+    edges = np.resize(np.array(thr, dtype=np.float32), SAMPLES_PER_FRAME // 2)
+    x[near] = edges - noise[near] * noise_std
+    x_before, noise_before = x.copy(), noise.copy()
+
+    out = np.empty(SAMPLES_PER_FRAME // 4, dtype=np.uint8)
+    sender.quantize_pack(x, noise, noise_std, *thr, out)
+    expected = _pack(_quantize(x + noise * noise_std, thr))
+    np.testing.assert_array_equal(out, expected)
+    np.testing.assert_array_equal(x, x_before)
+    np.testing.assert_array_equal(noise, noise_before)
+
+
+@pytest.fixture
+def sock():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        yield s
+
+
+def _encoder(sock, fps, batch=4, secs_from_ref=1000, ref_epoch=5):
+    ring = sender.PacketRing(sock, batch, 8 + sender.VDIF_HEADER_BYTES + SAMPLES_PER_FRAME // 4)
+    encoder = sender.FrameEncoder(ring, True, fps, 1e6, 0.2, ref_epoch, secs_from_ref)
+    encoder._rng = np.random.default_rng(4)
+    return ring, encoder
+
+
+def test_encoder_stamps_across_second(sock):
+    fps = 10
+    ring, encoder = _encoder(sock, fps)
+    header = sender.build_vdif_header(1000, 5, 0, ring.buf.shape[1] - 8)
+    for start in range(0, 12, 4):  # the last batch starts a new second halfway
+        encoder.encode(4)
+        for k in range(4):
+            frame = start + k
+            packet = ring.buf[k].tobytes()
+            assert struct.unpack_from(">Q", packet, 0)[0] == frame
+            w0, w1 = struct.unpack_from(">II", packet, 8)
+            assert w0 == sender.vdif_word0(1000 + frame // fps)
+            assert w1 == sender.vdif_word1(5, frame % fps)
+            assert packet[16:40] == header[8:]
+    assert encoder.secs_from_ref == 1001
+    assert encoder.frame_within_sec == 2
+    assert encoder.seqno == 12
+
+
+@pytest.mark.skipif(sender.quantize_pack is None, reason="numba is not installed")
+def test_encoder_numba_matches_numpy(sock, monkeypatch):
+    ring, encoder = _encoder(sock, 11176)
+    ring_np, encoder_np = _encoder(sock, 11176)
+    for _ in range(3):
+        encoder.encode(4)
+        with monkeypatch.context() as m:
+            m.setattr(sender, "quantize_pack", None)
+            encoder_np.encode(4)
+        np.testing.assert_array_equal(ring.buf, ring_np.buf)
@@ -4,65 +4,29 @@
 import argparse
 import asyncio
 import logging
-import re
 
-from aiokatcp import DeviceServer, Sensor
+from katsdpvlbi.jive_proto import (
+    RE_RECORD,
+    Jive5abServerBase,
+    parse_port,
+    parse_protocol,
+    parse_status,
+)
 
 logger = logging.getLogger(__name__)
 
 
-# ---------------- low-level jive helpers ----------------
-
-async def jive_cmd(port: int, cmd: str, timeout: float = 1.0) -> str:
-    """Send *cmd* to the jive5ab control port and return the raw reply."""
-
-    reader, writer = await asyncio.wait_for(
-        asyncio.open_connection("127.0.0.1", port), timeout=timeout
-    )
-    try:
-        writer.write((cmd.strip() + ";\n").encode("ascii"))
-        await writer.drain()
-        data = await asyncio.wait_for(reader.read(4096), timeout=timeout)
-        return data.decode("ascii", errors="ignore")
-    finally:
-        writer.close()
-        try:
-            await writer.wait_closed()
-        except Exception:
-            pass
-
-
-def parse_status(reply: str) -> str:
-    """Extract the state from a ``status?`` reply."""
-
-    m = re.search(r"!status\?\s+\d+\s:\s(\w+)\s:\s(\d+)", reply)
-    return m.group(1) if m else "unknown"
-
-
-def parse_protocol(reply: str) -> str:
-    """Extract the network protocol from a ``net_protocol?`` reply."""
-
-    m = re.search(r"!net_protocol\?\s+\d+\s:\s([A-Za-z0-9_]+)", reply)
-    return m.group(1) if m else "unknown"
-
-
-def parse_port(reply: str) -> str:
-    """Extract the configured port from a ``net_port?`` reply."""
-
-    m = re.search(r"!net_port\?\s+\d+\s:\s(.+?)\s;", reply)
-    return m.group(1).strip() if m else "unknown"
-
-
 # ---------------- aiokatcp server ----------------
 
-class Jive5abServer(DeviceServer):
+class Jive5abServer(Jive5abServerBase):
     VERSION = "jive5ab-katcp-proxy 0.3"
     BUILD_STATE = "unknown"
     DESCRIPTION = "KATCP proxy that forwards control to a local jive5ab instance"
+    POLL_INTERVAL = 120.0
+    POLL_INTERVAL_MAX = 600.0
 
     def __init__(self, host: str, port: int, jive_port: int):
-        super().__init__(host, port)
-        self.jive_port = jive_port
+        super().__init__(host, port, jive_port)
 
         self.s_state = self._make_sensor(str, "jive5ab-state", "jive5ab state", "unknown")
         self.s_bytes = self._make_sensor(int, "jive5ab-bytes", "bytes written", 0)
@@ -71,54 +35,69 @@ class Jive5abServer(DeviceServer):
         self.s_error = self._make_sensor(str, "jive5ab-error", "last proxy error", "")
 
         self._poll_task = None
-
-    def _make_sensor(self, sensor_type, name, description, initial):
-        """Create a sensor, initialise it and add it to the server."""
-
-        sensor = Sensor(sensor_type, name, description)
-        sensor.set_value(initial)
-        # Older aiokatcp only accepts one sensor per add()
-        self.sensors.add(sensor)
-        return sensor
+        self._poll_interval = self.POLL_INTERVAL
+        self._poll_stable = 0
+        self._poll_reset = asyncio.Event()
 
     async def start(self):
         await super().start()
         self._poll_task = asyncio.create_task(self._poll_loop())
 
-    async def stop(self):
+    async def on_stop(self):
+        # Stop polling before the base class closes the jive5ab connection
         if self._poll_task:
             self._poll_task.cancel()
             try:
                 await self._poll_task
             except asyncio.CancelledError:
                 pass
-        await super().stop()
+        await super().on_stop()
 
     async def _poll_loop(self):
         while True:
             await self._poll_once()
-            await asyncio.sleep(120.0)
-
-    async def _poll_once(self) -> None:
-        try:
-            reply = await jive_cmd(self.jive_port, "status?")
-            self.s_state.set_value(parse_status(reply))
-            self.s_error.set_value("")
-        except (asyncio.TimeoutError, OSError) as err:
-            self.s_error.set_value(f"status?: {err}")
-            logger.error("status? failed: %s", err)
-        try:
-            reply = await jive_cmd(self.jive_port, "net_protocol?")
-            self.s_proto.set_value(parse_protocol(reply))
-        except (asyncio.TimeoutError, OSError) as err:
-            self.s_error.set_value(f"net_protocol?: {err}")
-            logger.error("net_protocol? failed: %s", err)
+            # Restart the wait if a request-driven poll shortens the interval
+            while True:
+                self._poll_reset.clear()
+                try:
+                    async with asyncio.timeout(self._poll_interval):
+                        await self._poll_reset.wait()
+                except asyncio.TimeoutError:
+                    break
+
+    async def _poll_once(self, reset: bool = False) -> None:
+        """Refresh the sensors from jive5ab.
+
+        The poll interval doubles (up to POLL_INTERVAL_MAX) each time nothing
+        has changed, and drops back to POLL_INTERVAL on any change or error,
+        or when *reset* is given (polls that follow a user request).
+        """
+        queries = (
+            ("status?", self.s_state, parse_status),
+            ("net_protocol?", self.s_proto, parse_protocol),
+            ("net_port?", self.s_nport, parse_port),
+        )
+        changed = reset
         try:
-            reply = await jive_cmd(self.jive_port, "net_port?")
-            self.s_nport.set_value(parse_port(reply))
+            replies = await self._jive_cmds([cmd for cmd, _, _ in queries])
         except (asyncio.TimeoutError, OSError) as err:
-            self.s_error.set_value(f"net_port?: {err}")
-            logger.error("net_port? failed: %s", err)
+            self.s_error.set_value(f"poll: {err}")
+            logger.error("poll failed: %s", err)
+            changed = True
+        else:
+            self.s_error.set_value("")
+            for (_, sensor, parse), reply in zip(queries, replies):
+                value = parse(reply)
+                changed = changed or value != sensor.value
+                sensor.set_value(value)
+        if changed:
+            self._poll_stable = 0
+            self._poll_reset.set()
+        else:
+            self._poll_stable += 1
+        self._poll_interval = min(
+            self.POLL_INTERVAL_MAX, self.POLL_INTERVAL * 2 ** min(self._poll_stable, 3)
+        )
 
     # ---------------- KATCP requests (name-based) ----------------
 
@@ -140,8 +119,8 @@ class Jive5abServer(DeviceServer):
         except ValueError as err:
             return "fail", str(err)
         try:
-            await jive_cmd(self.jive_port, cmd)
-            await self._poll_once()
+            await self._jive_cmd(cmd)
+            await self._poll_once(reset=True)
             return "ok", ""
         except (asyncio.TimeoutError, OSError) as err:
             self.s_error.set_value(str(err))
@@ -159,8 +138,8 @@ class Jive5abServer(DeviceServer):
         except ValueError:
             return "fail", "invalid port"
         try:
-            await jive_cmd(self.jive_port, f"net_port = {destination}")
-            await self._poll_once()
+            await self._jive_cmd(f"net_port = {destination}")
+            await self._poll_once(reset=True)
             return "ok", ""
         except (asyncio.TimeoutError, OSError) as err:
             self.s_error.set_value(str(err))
@@ -174,7 +153,7 @@ class Jive5abServer(DeviceServer):
         # send comma-separated list
         joined = ":".join(paths)
         try:
-            await jive_cmd(self.jive_port, f"set_disks = {joined}")
+            await self._jive_cmd(f"set_disks = {joined}")
             return "ok", ""
         except (asyncio.TimeoutError, OSError) as err:
             self.s_error.set_value(str(err))
@@ -186,9 +165,9 @@ class Jive5abServer(DeviceServer):
         if not scan_name:
             return "fail", "scan_name required"
         try:
-            await jive_cmd(self.jive_port, f"record = on:{scan_name}")
+            await self._jive_cmd(f"record = on:{scan_name}")
             # Many builds do not echo bytes for record?, but poll anyway:
-            await self._poll_once()
+            await self._poll_once(reset=True)
             return "ok", ""
         except (asyncio.TimeoutError, OSError) as err:
             self.s_error.set_value(str(err))
@@ -198,8 +177,8 @@ class Jive5abServer(DeviceServer):
     async def request_record_stop(self, ctx):
         """Stop VBS recording. Usage: ?record-stop"""
         try:
-            await jive_cmd(self.jive_port, "record = off")
-            await self._poll_once()
+            await self._jive_cmd("record = off")
+            await self._poll_once(reset=True)
             return "ok", ""
         except (asyncio.TimeoutError, OSError) as err:
             self.s_error.set_value(str(err))
@@ -209,10 +188,10 @@ class Jive5abServer(DeviceServer):
     async def request_record_status(self, ctx):
         """Query VBS recording status. Usage: ?record-status"""
         try:
-            rep = await jive_cmd(self.jive_port, "record?")
+            rep = await self._jive_cmd("record?")
             # Some versions reply as: !record? 0 : <state> : <bytes> ;
             # If not parseable, return the raw reply.
-            m = re.search(r"!record\?\s+\d+\s:\s(\w+)\s:\s(\d+)", rep)
+            m = RE_RECORD.search(rep)
             if m:
                 state, bytes_ = m.group(1), m.group(2)
                 return "ok", f"{state} {bytes_}B"
@@ -226,14 +205,14 @@ class Jive5abServer(DeviceServer):
     async def request_net2file_start(self, ctx, output_path="/mnt/disk0/testscan/testscan.vdif"):
         """Start legacy net2file to OUTPUT_PATH."""
         try:
-            r = await jive_cmd(self.jive_port, f"net2file = open : {output_path}, w")
+            r = await self._jive_cmd(f"net2file = open : {output_path}, w")
             if not r.startswith("!net2file = 0"):
-                await jive_cmd(self.jive_port, "net2file = connect")
-                r2 = await jive_cmd(self.jive_port, f"net2file = open : {output_path}, w")
+                await self._jive_cmd("net2file = connect")
+                r2 = await self._jive_cmd(f"net2file = open : {output_path}, w")
                 if not r2.startswith("!net2file = 0"):
                     return "fail", "open failed"
-            await jive_cmd(self.jive_port, "net2file = on")
-            await self._poll_once()
+            await self._jive_cmd("net2file = on")
+            await self._poll_once(reset=True)
             return "ok", ""
         except (asyncio.TimeoutError, OSError) as err:
             self.s_error.set_value(str(err))
@@ -243,10 +222,10 @@ class Jive5abServer(DeviceServer):
     async def request_net2file_stop(self, ctx):
         """Stop legacy net2file (off, flush, close)."""
         try:
-            await jive_cmd(self.jive_port, "net2file = off")
-            await jive_cmd(self.jive_port, "net2file = flush")
-            await jive_cmd(self.jive_port, "net2file = close")
-            await self._poll_once()
+            await self._jive_cmd("net2file = off")
+            await self._jive_cmd("net2file = flush")
+            await self._jive_cmd("net2file = close")
+            await self._poll_once(reset=True)
             return "ok", ""
         except (asyncio.TimeoutError, OSError) as err:
             self.s_error.set_value(str(err))
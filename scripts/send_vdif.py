@@ -19,6 +19,14 @@ UDPS_BE        = True           # UDPS sequence number endianness (big-endian ty
 PACE           = True           # sleep(1/FPS)
 # ------------------------------------------------
 
+_LE_U32 = struct.Struct("<I")
+_LE_U32X2 = struct.Struct("<II")  # header words 0 and 1
+_SEQ = struct.Struct(">Q" if UDPS_BE else "<Q")
+
+def vdif_word1(frame: int) -> int:
+    """Header word 1: frame number, reference epoch, invalid=0."""
+    return (frame & 0x00FFFFFF) | ((REF_EPOCH & 0x3F) << 24)
+
 def build_vdif_header(second: int, frame: int) -> bytes:
     """
     VDIF v1 header layout (32 bytes), little-endian words:
@@ -31,30 +39,29 @@ def build_vdif_header(second: int, frame: int) -> bytes:
     h = bytearray(32)
 
     # word0
-    struct.pack_into("<I", h, 0x00, second)
+    _LE_U32.pack_into(h, 0x00, second)
 
     # word1
-    w1 = (frame & 0x00FFFFFF) | ((REF_EPOCH & 0x3F) << 24)  # invalid=0
-    struct.pack_into("<I", h, 0x04, w1)
+    _LE_U32.pack_into(h, 0x04, vdif_word1(frame))
 
     # word2
     flen8 = FRAME_SIZE // 8  # 8256/8 = 1032 (0x408)
     w2 = (flen8 & 0x00FFFFFF) | ((VERSION & 0x3F) << 24)
-    struct.pack_into("<I", h, 0x08, w2)
+    _LE_U32.pack_into(h, 0x08, w2)
 
     # word3
     w3 = (THREAD_ID & 0x3FF)
-    struct.pack_into("<I", h, 0x0C, w3)
+    _LE_U32.pack_into(h, 0x0C, w3)
 
     # words 4..7 remain zero
     return bytes(h)
 
 def header_selfcheck(hdr: bytes):
     """Print and sanity-check header fields."""
-    sec  = struct.unpack_from("<I", hdr, 0x00)[0]
-    w1   = struct.unpack_from("<I", hdr, 0x04)[0]
-    w2   = struct.unpack_from("<I", hdr, 0x08)[0]
-    w3   = struct.unpack_from("<I", hdr, 0x0C)[0]
+    sec  = _LE_U32.unpack_from(hdr, 0x00)[0]
+    w1   = _LE_U32.unpack_from(hdr, 0x04)[0]
+    w2   = _LE_U32.unpack_from(hdr, 0x08)[0]
+    w3   = _LE_U32.unpack_from(hdr, 0x0C)[0]
     flen8 = w2 & 0x00FFFFFF
     ver   = (w2 >> 24) & 0x3F
     print("hdr[0:32] =", binascii.hexlify(hdr).decode())
@@ -73,23 +80,29 @@ def run_sender(args):
         header_selfcheck(hdr)
         return
 
+    sock.connect((args.dest, args.port))
     seq = 0
     second = int(time.time())
     frame  = 0
     inter_frame = 1.0 / args.fps if args.fps > 0 else 0.0
 
+    # Packets are gathered by sendmsg() from three buffers that are patched
+    # in place: 8-byte UDPS sequence-number prefix, header, payload
+    seq_hdr = bytearray(_SEQ.size)
+    hdr = bytearray(build_vdif_header(second, frame))
+    payload = bytes(PAYLOAD_SIZE)   # replace with generated samples if desired
+    parts = [seq_hdr, hdr, payload]
+
     while True:
-        hdr = build_vdif_header(second, frame)
+        _LE_U32X2.pack_into(hdr, 0x00, second, vdif_word1(frame))
         if args.debug and frame == 0:
             header_selfcheck(hdr)
 
-        payload = bytes(PAYLOAD_SIZE)   # replace with generated samples if desired
-        vdif_frame = hdr + payload
-
-        # 8-byte UDPS sequence-number prefix
-        seq_hdr = struct.pack(">Q" if UDPS_BE else "<Q", seq)
-        pkt = seq_hdr + vdif_frame
-        sock.sendto(pkt, (args.dest, args.port))
+        _SEQ.pack_into(seq_hdr, 0, seq)
+        try:
+            sock.sendmsg(parts)
+        except ConnectionRefusedError:
+            pass  # ICMP port unreachable from an earlier packet: nobody listening yet
 
         seq   += 1
         frame += 1
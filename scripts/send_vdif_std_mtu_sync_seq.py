@@ -1,14 +1,257 @@
 #!/usr/bin/env python3
-import argparse, math, socket, struct, time
+import argparse, ctypes, ctypes.util, errno, math, os, socket, struct, sys, time
 import numpy as np
 from datetime import datetime, timezone
 
+try:
+    import numba
+except ImportError:
+    numba = None
+
 VDIF_HEADER_BYTES = 32
 VDIF_VERSION = 1
 BITS_PER_SAMPLE = 2  # actual bits per sample (not minus one)
 CHANNELS = 1
 STATION_ID = "AA"
 THREAD_ID = 0
+SPIN_NS = 50_000  # busy-wait the last 50 us before a deadline
+START_GUARD_NS = 100_000_000  # start a second later if the next one is closer than this
+
+_HDR_WORDS_STRUCT = struct.Struct(">II")  # a pair of big-endian VDIF header words
+
+# Constant VDIF header fields: word 0 flags (legacy header, valid), the low
+# byte of word 2 (log2 channels, version) and all of word 3
+_W0_FLAGS = 1 << 30
+_W2_LOW = ((int(math.log2(CHANNELS)) & 0x1F) << 3) | (VDIF_VERSION & 0x7)
+_STATION = (ord(STATION_ID[0]) << 8) | ord(STATION_ID[1])
+_W3 = ((_STATION & 0xFFFF) << 16) | ((THREAD_ID & 0x3FF) << 6) | (((BITS_PER_SAMPLE - 1) & 0x1F) << 1)
+
+TIMER_ABSTIME = 1
+TFD_TIMER_ABSTIME = 1
+TFD_CLOEXEC = 0o2000000
+SO_SNDBUFFORCE = getattr(socket, "SO_SNDBUFFORCE", 32)  # Linux; not exported by Python
+UDP_SEGMENT = getattr(socket, "UDP_SEGMENT", 103)  # Linux >= 4.18
+GSO_MAX_BYTES = 65507  # largest IPv4 UDP payload, and so the largest GSO send
+MCL_CURRENT, MCL_FUTURE = 1, 2
+RT_PRIORITY = 80  # SCHED_FIFO priority under --rt
+
+try:
+    _LIBC = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+except OSError:
+    _LIBC = None
+
+def _libc_function(name, restype, argtypes):
+    """Return libc's *name*, or None where it is unavailable (e.g. on macOS)."""
+    fn = getattr(_LIBC, name, None)
+    if fn is not None:
+        fn.restype = restype
+        fn.argtypes = argtypes
+    return fn
+
+class _Timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+class _Itimerspec(ctypes.Structure):
+    _fields_ = [("it_interval", _Timespec), ("it_value", _Timespec)]
+
+class _Iovec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p), ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_Iovec)), ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p), ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _Msghdr), ("msg_len", ctypes.c_uint)]
+
+_clock_nanosleep = _libc_function(
+    "clock_nanosleep", ctypes.c_int,
+    [ctypes.c_int, ctypes.c_int, ctypes.POINTER(_Timespec), ctypes.c_void_p])
+_timerfd_create = _libc_function("timerfd_create", ctypes.c_int, [ctypes.c_int, ctypes.c_int])
+_timerfd_settime = _libc_function(
+    "timerfd_settime", ctypes.c_int,
+    [ctypes.c_int, ctypes.c_int, ctypes.POINTER(_Itimerspec), ctypes.c_void_p])
+_mlockall = _libc_function("mlockall", ctypes.c_int, [ctypes.c_int])
+_sendmmsg = _libc_function(
+    "sendmmsg", ctypes.c_int,
+    [ctypes.c_int, ctypes.POINTER(_Mmsghdr), ctypes.c_uint, ctypes.c_int])
+
+def sleep_until(deadline_ns, clock=time.CLOCK_MONOTONIC):
+    """Block until *clock* reaches *deadline_ns*.
+
+    Sleeps on an absolute deadline (so scheduling delays don't accumulate)
+    until SPIN_NS before it, then spins to absorb the kernel's wake-up slack.
+    """
+    wake_ns = deadline_ns - SPIN_NS
+    if _clock_nanosleep is not None:
+        ts = _Timespec(*divmod(wake_ns, 1_000_000_000))
+        while _clock_nanosleep(clock, TIMER_ABSTIME, ctypes.byref(ts), None) == errno.EINTR:
+            pass
+    else:
+        delay = wake_ns - time.clock_gettime_ns(clock)
+        if delay > 0:
+            time.sleep(delay / 1e9)
+    while time.clock_gettime_ns(clock) < deadline_ns:
+        pass
+
+def set_realtime(priority):
+    """Run under SCHED_FIFO at *priority* with all current and future memory locked.
+
+    Needs CAP_SYS_NICE and CAP_IPC_LOCK (or a large enough RLIMIT_MEMLOCK);
+    a step that is not permitted is reported and skipped.
+    """
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+    except (AttributeError, OSError) as err:
+        print(f"Warning: cannot switch to SCHED_FIFO: {err}")
+    if _mlockall is None:
+        print("Warning: cannot lock memory: mlockall unavailable")
+    elif _mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+        print(f"Warning: cannot lock memory: {os.strerror(ctypes.get_errno())}")
+
+class BatchPacer:
+    """Release batches of *batch* frames at *fps* frames/s on CLOCK_MONOTONIC.
+
+    Where timerfd is available a periodic timer fires SPIN_NS before each
+    batch is due, so :meth:`wait` is one read() plus a short spin; otherwise
+    it falls back to :func:`sleep_until`. Deadlines are counted in whole
+    frames from the start, and the timer is re-armed on them about once a
+    second so its rounded period cannot drift. A pacer that falls a whole
+    batch behind restarts from now instead of bursting to catch up.
+    """
+
+    def __init__(self, batch, fps):
+        self.batch = batch
+        self.fps = fps
+        self._period_ns = batch * 1_000_000_000 // fps
+        self._rearm_every = max(1, fps // batch)
+        self._fd = -1
+        if _timerfd_create is not None and _timerfd_settime is not None:
+            self._fd = _timerfd_create(time.CLOCK_MONOTONIC, TFD_CLOEXEC)
+        self.start(time.monotonic_ns())
+
+    def _deadline_ns(self, ticks):
+        return self._t0_ns + ticks * self.batch * 1_000_000_000 // self.fps
+
+    def start(self, t0_ns):
+        """Count batch deadlines from *t0_ns*; the first one is a batch later."""
+        self._t0_ns = t0_ns
+        self._ticks = 0
+        if self._fd >= 0:
+            self._arm()
+
+    def _arm(self):
+        spec = _Itimerspec()
+        spec.it_interval.tv_sec, spec.it_interval.tv_nsec = divmod(self._period_ns, 1_000_000_000)
+        spec.it_value.tv_sec, spec.it_value.tv_nsec = divmod(
+            self._deadline_ns(self._ticks + 1) - SPIN_NS, 1_000_000_000)
+        if _timerfd_settime(self._fd, TFD_TIMER_ABSTIME, ctypes.byref(spec), None) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def wait(self):
+        """Block until the next batch is due."""
+        self._ticks += 1
+        deadline_ns = self._deadline_ns(self._ticks)
+        if self._fd < 0:
+            now_ns = time.monotonic_ns()
+            if deadline_ns > now_ns:
+                sleep_until(deadline_ns)
+            elif now_ns >= deadline_ns + self._period_ns:
+                self.start(now_ns)
+            # less than a batch late: send now and keep the schedule
+            return
+        expirations = int.from_bytes(os.read(self._fd, 8), sys.byteorder)
+        if expirations > 1:
+            self.start(time.monotonic_ns())
+            return
+        while time.monotonic_ns() < deadline_ns:
+            pass
+        if self._ticks % self._rearm_every == 0:
+            self._arm()
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+class PacketRing:
+    """Equal-sized packets in one contiguous buffer, sent a batch at a time.
+
+    Rows of :attr:`buf` are filled in place; :meth:`send` hands the first *n*
+    to the kernel in a single sendmmsg(2) call on the connected socket *sock*,
+    or with one send() each where sendmmsg is unavailable. With *gso* the
+    batch goes out as one send() that the kernel splits into packets
+    (UDP_SEGMENT), falling back to sendmmsg if the kernel refuses the socket
+    option or, for this route, the GSO send itself.
+    """
+
+    def __init__(self, sock, n_packets, packet_bytes, gso=False):
+        self.sock = sock
+        self.buf = np.zeros((n_packets, packet_bytes), dtype=np.uint8)
+        self.rows = [memoryview(row) for row in self.buf]
+        self._packet_bytes = packet_bytes
+        self._flat = memoryview(self.buf.reshape(-1))
+        self.gso = False
+        if gso:
+            try:
+                sock.setsockopt(socket.IPPROTO_UDP, UDP_SEGMENT, packet_bytes)
+                self.gso = True
+            except OSError as err:
+                print(f"Warning: UDP GSO unavailable ({err}), using sendmmsg")
+        self._iov = (_Iovec * n_packets)()
+        self._msgs = (_Mmsghdr * n_packets)()
+        for i in range(n_packets):
+            self._iov[i].iov_base = self.buf[i].ctypes.data
+            self._iov[i].iov_len = packet_bytes
+            self._msgs[i].msg_hdr.msg_iov = ctypes.pointer(self._iov[i])
+            self._msgs[i].msg_hdr.msg_iovlen = 1
+
+    def send(self, n):
+        """Send the first *n* packets of the ring (nothing at all for *n* == 0)."""
+        if n <= 0:
+            return  # a zero-length GSO send would still emit an empty datagram
+        while self.gso:
+            try:
+                self.sock.send(self._flat[:n * self._packet_bytes])
+                return
+            except ConnectionRefusedError:
+                # An earlier ICMP port unreachable, as for sendmmsg below; reporting
+                # it cleared it, but the whole segmented send was dropped, so resend
+                continue
+            except OSError as err:
+                # EIO: no checksum offload or an xfrm route; EINVAL: e.g. SO_NO_CHECK
+                if err.errno not in (errno.EIO, errno.EINVAL):
+                    raise
+                print(f"Warning: UDP GSO send failed ({err}), using sendmmsg")
+                self.gso = False
+                try:
+                    # The kernel applies the same checks to any send while gso_size is set
+                    self.sock.setsockopt(socket.IPPROTO_UDP, UDP_SEGMENT, 0)
+                except OSError:
+                    pass
+        if _sendmmsg is None:
+            for row in self.rows[:n]:
+                try:
+                    self.sock.send(row)
+                except ConnectionRefusedError:
+                    pass  # ICMP port unreachable from an earlier packet: nobody listening yet
+            return
+        fd = self.sock.fileno()
+        sent = 0
+        while sent < n:
+            ret = _sendmmsg(fd, ctypes.byref(self._msgs[sent]), n - sent, 0)
+            if ret < 0:
+                err = ctypes.get_errno()
+                # ECONNREFUSED reports an earlier ICMP port unreachable, as for send()
+                if err not in (errno.EINTR, errno.ECONNREFUSED):
+                    raise OSError(err, os.strerror(err))
+            else:
+                sent += ret
 
 def vdif_ref_epoch_info(unix_t):
     epoch0 = datetime(2000,1,1,tzinfo=timezone.utc).timestamp()
@@ -29,38 +272,181 @@ def build_vdif_header(secs_from_ref, ref_epoch, frame_within_sec, frame_len_byte
     caused ``vbsrecord`` to abort with ``rtm==fill2vbs``.
     """
 
-    frame_len_8 = frame_len_bytes // 8
-    log2ch = int(math.log2(CHANNELS))
+    w2 = (((frame_len_bytes // 8) & 0x00FFFFFF) << 8) | _W2_LOW
 
-    # Word 0
-    legacy = 1  # we only implement the legacy 32 byte header
-    invalid = 0
-    w0 = ((invalid & 0x1) << 31) | ((legacy & 0x1) << 30) | (secs_from_ref & 0x3FFFFFFF)
+    header = bytearray(VDIF_HEADER_BYTES)
+    _HDR_WORDS_STRUCT.pack_into(header, 8, w2, _W3)
+    update_vdif_header(header, secs_from_ref, ref_epoch, frame_within_sec)
+    return header
 
-    # Word 1
-    w1 = ((frame_within_sec & 0xFFFFFF) << 8) | ((ref_epoch & 0x3F) << 2)
+def update_vdif_header(header, secs_from_ref, ref_epoch, frame_within_sec):
+    """Patch the per-frame words 0 and 1 of a header from :func:`build_vdif_header`.
 
-    # Word 2
-    w2 = ((frame_len_8 & 0x00FFFFFF) << 8) | ((log2ch & 0x1F) << 3) | (VDIF_VERSION & 0x7)
+    Words 2 and 3 are constant for the whole stream and are left untouched.
+    """
+    _HDR_WORDS_STRUCT.pack_into(
+        header, 0, vdif_word0(secs_from_ref), vdif_word1(ref_epoch, frame_within_sec))
 
-    # Word 3
-    station = (ord(STATION_ID[0]) << 8) | ord(STATION_ID[1])
-    w3 = ((station & 0xFFFF) << 16) | ((THREAD_ID & 0x3FF) << 6) | (((BITS_PER_SAMPLE - 1) & 0x1F) << 1)
+def vdif_word0(secs_from_ref):
+    """Header word 0 of a valid frame in the legacy 32 byte header format."""
+    return _W0_FLAGS | (secs_from_ref & 0x3FFFFFFF)
 
-    header = bytearray(VDIF_HEADER_BYTES)
-    struct.pack_into(">IIII", header, 0, w0, w1, w2, w3)
-    return header
+def vdif_word1(ref_epoch, frame_within_sec):
+    """Header word 1; *frame_within_sec* may also be an integer array."""
+    return ((frame_within_sec & 0xFFFFFF) << 8) | ((ref_epoch & 0x3F) << 2)
+
+def quantize_thresholds(sigma):
+    """Return the optimal 2-bit thresholds (-0.9816, 0, +0.9816 sigma) for Gaussian input.
+
+    They are float32 like the signal, so every comparison against them rounds
+    the same way (NumPy would otherwise compare some in float64).
+    """
+    t = np.float32(0.9816 * sigma)
+    return (-t, np.float32(0.0), t)
 
-def quantize_2bit_unsigned(x):
-    thr = np.percentile(x, [25, 50, 75])
-    return np.digitize(x, thr, right=True).astype(np.uint8)
+def quantize_2bit_unsigned(x, thr, out, tmp):
+    """Quantise *x* into *out* (uint8) as the number of thresholds below each sample.
+
+    *tmp* is a bool scratch array of the same length.
+    """
+    np.greater(x, thr[0], out=out)
+    for t in thr[1:]:
+        np.greater(x, t, out=tmp)
+        out += tmp
+    return out
+
+def pack_2bit(q, out, tmp):
+    """Pack 2-bit samples *q* four to a byte (first sample in the top bits) into *out*.
+
+    Works on four samples at a time through a little-endian uint32 view of
+    *q*, so len(q) must be a multiple of 4 (a frame always is: 4 samples per
+    payload byte); *tmp* is a (2, len(out)) uint32 scratch array.
+    """
+    v = q.view("<u4")
+    w, t = tmp
+    np.left_shift(v, 6, out=w); w &= 0xC0
+    np.right_shift(v, 4, out=t); t &= 0x30; w |= t
+    np.right_shift(v, 14, out=t); t &= 0x0C; w |= t
+    np.right_shift(v, 24, out=t); w |= t
+    np.copyto(out, w, casting="unsafe")
+    return out
+
+def _quantize_pack(x, noise, noise_std, thr0, thr1, thr2, out):
+    """Add *noise_std* * *noise* to *x*, quantise to 2 bits and pack four samples
+    per byte into *out*, all in one pass.
+
+    Equivalent to adding the scaled noise, then :func:`quantize_2bit_unsigned`
+    followed by :func:`pack_2bit`; *x* and *noise* are left unchanged.
+    """
+    for i in range(out.shape[0]):
+        b = 0
+        for j in range(4):
+            v = x[4*i + j] + noise_std * noise[4*i + j]
+            b = (b << 2) | ((v > thr0) + (v > thr1) + (v > thr2))
+        out[i] = b
 
-def pack_2bit(q):
-    pad = (-len(q)) % 4
-    if pad: q = np.pad(q, (0, pad), mode="constant")
-    q4 = q.reshape(-1, 4)
-    b = ((q4[:,0] << 6) | (q4[:,1] << 4) | (q4[:,2] << 2) | q4[:,3]).astype(np.uint8)
-    return b.tobytes()
+if numba is not None:
+    # Explicit signature so compilation happens at import, not on the first frame.
+    # No fastmath: a fused multiply-add would round samples next to a
+    # threshold differently from the NumPy path.
+    quantize_pack = numba.njit(
+        "void(float32[::1], float32[::1], float32, float32, float32, float32, uint8[::1])",
+        cache=True)(_quantize_pack)
+else:
+    quantize_pack = None
+
+class FrameEncoder:
+    """Synthesise tone-plus-noise VDIF frames into the rows of a :class:`PacketRing`.
+
+    Keeps the running stream state (tone phase, VDIF time stamp, udps seqno),
+    so whatever drives the sender only decides when each batch goes out.
+    """
+
+    def __init__(self, ring, seq, fps, tone_hz, noise_std, ref_epoch, secs_from_ref):
+        self.ring = ring
+        self.seq = seq
+        self.fps = fps
+        self.noise_std = noise_std
+        self.ref_epoch = ref_epoch
+        self.secs_from_ref = secs_from_ref
+        self.frame_within_sec = 0
+        self.seqno = 0
+
+        # Packets ([8B seqno] + header + payload) are assembled in place in the ring
+        hdr_off = 8 if seq else 0
+        pay_off = hdr_off + VDIF_HEADER_BYTES
+        frame_bytes = ring.buf.shape[1] - hdr_off
+        samples_per_frame = (frame_bytes - VDIF_HEADER_BYTES) * 4
+        ring.buf[:, hdr_off:pay_off] = np.frombuffer(
+            build_vdif_header(secs_from_ref, ref_epoch, 0, frame_bytes), dtype=np.uint8)
+        # Big-endian view of header words 0 and 1 in every slot, and word 1 for
+        # every frame of a second, so patching a header is two array stores
+        self._hdr_words = ring.buf.view(">u4")[:, hdr_off // 4:hdr_off // 4 + 2]
+        self._word1 = vdif_word1(ref_epoch, np.arange(fps, dtype=np.uint32)).astype(">u4")
+        self._word0 = vdif_word0(secs_from_ref)  # only changes once a second
+        self._payloads = [row[pay_off:] for row in ring.buf]
+        # udps seqno (8B big-endian) of every slot, stamped a batch at a time
+        self._seqnos = ring.buf[:, :8].view(">u8")[:, 0]
+        self._slots = np.arange(ring.buf.shape[0], dtype=np.uint64)
+
+        # One-frame tone tables; each frame is sin(wt)*cos(phase) + cos(wt)*sin(phase).
+        # The signal is float32, plenty for 2-bit output; the tables and the
+        # running phase are computed in float64 so the tone stays exact.
+        t = np.arange(samples_per_frame, dtype=np.float64) / (samples_per_frame * fps)
+        self._sin_tab = np.sin(2*math.pi*tone_hz*t).astype(np.float32)
+        self._cos_tab = np.cos(2*math.pi*tone_hz*t).astype(np.float32)
+        self._phase = 0.0
+        self._phase_inc = 2*math.pi*tone_hz / fps
+        n_slots = ring.buf.shape[0]
+        self._phase_steps = np.arange(n_slots) * self._phase_inc
+
+        self._rng = np.random.default_rng()
+        self._signal = np.empty((n_slots, samples_per_frame), dtype=np.float32)
+        self._scratch = np.empty((n_slots, samples_per_frame), dtype=np.float32)
+        self._q = np.empty(samples_per_frame, dtype=np.uint8)
+        self._q_tmp = np.empty(samples_per_frame, dtype=bool)
+        self._pack_tmp = np.empty((2, samples_per_frame // 4), dtype=np.uint32)
+
+        # The signal is stationary (unit tone plus noise), so its rms is known up front
+        self._thr = quantize_thresholds(math.sqrt(0.5 + noise_std**2))
+
+    def encode(self, n):
+        """Encode the next *n* frames of the stream into ring slots 0 to *n* - 1."""
+        # The tone for the whole batch is two outer products
+        signal, scratch = self._signal[:n], self._scratch[:n]
+        phases = self._phase + self._phase_steps[:n]
+        np.multiply.outer(np.cos(phases).astype(np.float32), self._sin_tab, out=signal)
+        np.multiply.outer(np.sin(phases).astype(np.float32), self._cos_tab, out=scratch)
+        signal += scratch
+        self._phase = (self._phase + n * self._phase_inc) % (2*math.pi)
+        # The whole batch is encoded before it is due, so its noise is one draw too
+        self._rng.standard_normal(out=scratch, dtype=np.float32)
+        if self.seq:
+            np.add(self._slots[:n], self.seqno, out=self._seqnos[:n], casting="unsafe")
+            self.seqno += n
+
+        # Per-frame loop: constants and stream state live in locals until the end
+        noise_std, fps = self.noise_std, self.fps
+        thr0, thr1, thr2 = self._thr
+        payloads, hdr_words, word1 = self._payloads, self._hdr_words, self._word1
+        fws, word0 = self.frame_within_sec, self._word0
+        for k in range(n):
+            frame, noise = signal[k], scratch[k]
+            if quantize_pack is not None:
+                quantize_pack(frame, noise, noise_std, thr0, thr1, thr2, payloads[k])
+            else:
+                noise *= noise_std
+                frame += noise
+                pack_2bit(quantize_2bit_unsigned(frame, self._thr, self._q, self._q_tmp), payloads[k], self._pack_tmp)
+            hdr_words[k, 0] = word0
+            hdr_words[k, 1] = word1[fws]
+
+            fws += 1
+            if fws == fps:
+                fws = 0
+                self.secs_from_ref += 1
+                word0 = vdif_word0(self.secs_from_ref)
+        self.frame_within_sec, self._word0 = fws, word0
 
 def main():
     ap = argparse.ArgumentParser(description="VDIF UDP sender (std MTU, second-synced)")
@@ -72,6 +458,12 @@ def main():
     ap.add_argument("--fps", type=int, default=11176, help="integer frames/s")
     ap.add_argument("--seq", type=bool, default=True, help="prepend 8B seqno for jive5ab udps mode")
     ap.add_argument("--sndbuf", type=int, default=16*1024*1024)
+    ap.add_argument("--batch", type=int, default=8, help="frames handed to the kernel per sendmmsg() call")
+    ap.add_argument("--gso", action="store_true", help="send each batch as one UDP GSO (UDP_SEGMENT) buffer")
+    ap.add_argument("--priority", type=int, default=6, help="SO_PRIORITY for the socket (0-6 need no privileges)")
+    ap.add_argument("--rt", action="store_true", help=f"run under SCHED_FIFO (priority {RT_PRIORITY}) with memory locked; "
+                    "combine with --cpu on an isolated core")
+    ap.add_argument("--cpu", type=int, help="pin the sender to this CPU")
     args = ap.parse_args()
 
     # Std MTU, udps seqno consumes 8 bytes: payload_bytes = 1472 - 8 - 32 = 1432
@@ -79,64 +471,60 @@ def main():
     samples_per_frame = vdif_payload_bytes * 4
     frame_bytes = VDIF_HEADER_BYTES + vdif_payload_bytes
     fps = int(args.fps)
-    frame_duration = 1.0 / fps
+    packet_bytes = (8 if args.seq else 0) + frame_bytes
+    if args.batch < 1:
+        ap.error("--batch must be at least 1")
+    if args.gso and args.batch * packet_bytes > GSO_MAX_BYTES:
+        ap.error(f"--gso needs --batch <= {GSO_MAX_BYTES // packet_bytes}")
     eff_sample_rate = samples_per_frame * fps
 
     print(f"Dest {args.ip}:{args.port}")
     print(f"udps-seq={'on' if args.seq else 'off'} | payload={vdif_payload_bytes}B | frame={frame_bytes}B | fps={fps} | Fs={eff_sample_rate/1e6:.6f} MS/s")
 
-    # Wait for next integer second (first frame at boundary)
-    while True:
-        now = time.time()
-        if now - math.floor(now) < 1e-3:
-            break
-        time.sleep(0.0002)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # Not capped by net.core.wmem_max, but needs CAP_NET_ADMIN
+        sock.setsockopt(socket.SOL_SOCKET, SO_SNDBUFFORCE, args.sndbuf)
+    except OSError:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, args.sndbuf)
+    sndbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) // 2  # Linux reports double
+    if sndbuf < args.sndbuf:
+        print(f"Warning: send buffer capped at {sndbuf} B (raise net.core.wmem_max)")
+    if hasattr(socket, "SO_PRIORITY"):  # Linux only
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_PRIORITY, args.priority)
+    sock.connect((args.ip, args.port))
 
-    # Ref epoch & seconds-from-ref at boundary
-    boundary = math.floor(time.time())
-    ref_epoch, secs_from_ref = vdif_ref_epoch_info(boundary)
+    ring = PacketRing(sock, args.batch, packet_bytes, gso=args.gso)
 
-    # One-frame time base
-    t = np.arange(samples_per_frame, dtype=np.float64) / eff_sample_rate
-    phase = 0.0
-    phase_inc = 2*math.pi*args.tone_hz*frame_duration
+    if args.cpu is not None:
+        os.sched_setaffinity(0, {args.cpu})
+    if args.rt:
+        set_realtime(RT_PRIORITY)
 
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, args.sndbuf)
+    # First frame goes out on an integer second; pick it only now that the
+    # slow setup is done, leaving time to build the encoder and first batch
+    boundary = (time.time_ns() + START_GUARD_NS) // 1_000_000_000 + 1
+    ref_epoch, secs_from_ref = vdif_ref_epoch_info(boundary)
+    encoder = FrameEncoder(ring, args.seq, fps, args.tone_hz, args.noise_std, ref_epoch, secs_from_ref)
 
     n_frames = int(args.duration * fps)
-    next_deadline = time.perf_counter()
-    frame_within_sec = 0
-    seqno = 0
-
-    for _ in range(n_frames):
-        signal = np.sin(2*math.pi*args.tone_hz*t + phase) + np.random.normal(0, args.noise_std, samples_per_frame)
-        phase += phase_inc
-        if phase >= 2*math.pi: phase -= 2*math.pi
-
-        q = quantize_2bit_unsigned(signal)
-        payload = pack_2bit(q)
-        header = build_vdif_header(secs_from_ref, ref_epoch, frame_within_sec, frame_bytes)
-
-        if args.seq:
-            pkt = struct.pack(">Q", seqno) + header + payload  # 8B big-endian seqno
-            seqno += 1
-        else:
-            pkt = header + payload
-
-        sock.sendto(pkt, (args.ip, args.port))
-
-        frame_within_sec += 1
-        if frame_within_sec == fps:
-            frame_within_sec = 0
-            secs_from_ref += 1
-
-        next_deadline += frame_duration
-        sleep_time = next_deadline - time.perf_counter()
-        if sleep_time > 0:
-            time.sleep(sleep_time)
-        else:
-            next_deadline = time.perf_counter()
+    # Each batch is encoded ahead of its deadline, so it leaves as soon as it is due
+    n = min(args.batch, n_frames)
+    encoder.encode(n)
+    sleep_until(boundary * 1_000_000_000, time.CLOCK_REALTIME)
+    pacer = BatchPacer(args.batch, fps)
+    try:
+        sent = 0
+        while True:
+            ring.send(n)
+            sent += n
+            n = min(args.batch, n_frames - sent)
+            if n <= 0:
+                break
+            encoder.encode(n)
+            pacer.wait()
+    finally:
+        pacer.close()
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-from setuptools import setup
+from setuptools import find_packages, setup
 
 
 tests_require = ["pytest"]
@@ -11,16 +11,18 @@ setup(
     description="MeerKAT VLBI data capture utilities",
     author="MeerKAT SDP team",
     author_email="sdpdev+katsdpvlbi@ska.ac.za",
+    packages=find_packages(include=["katsdpvlbi", "katsdpvlbi.*"]),
     scripts=[
         "scripts/jive5ab_katcp_proxy.py",
         "scripts/send_vdif.py",
         "scripts/send_vdif_std_mtu_sync_seq.py",
     ],
+    python_requires=">=3.11",
     install_requires=[
         "aiokatcp",
         "numpy",
     ],
-    extras_require={"test": tests_require},
+    extras_require={"test": tests_require, "numba": ["numba"]},
     tests_require=tests_require,
     use_katversion=True,
 )